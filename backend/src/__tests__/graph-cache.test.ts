@@ -0,0 +1,89 @@
+import { assertEquals } from "jsr:@std/assert";
+import {
+  decodeCachedGraphData,
+  encodeOsmData,
+  gunzip,
+  gzip,
+} from "../services/graph.service.ts";
+
+const osmData = {
+  nodes: {
+    101: { id: 101, lat: 44.4268, lon: 26.1025, tags: { kerb: "lowered" } },
+    102: { id: 102, lat: 44.4271, lon: 26.1031 },
+    9007199254740: { id: 9007199254740, lat: -33.8688, lon: 151.2093 },
+  },
+  ways: [
+    {
+      id: 501,
+      nodes: [101, 102, 9007199254740],
+      tags: { highway: "footway", width: "1.5 m", surface: "asphalt" },
+    },
+    { id: 502, nodes: [102, 101], tags: { highway: "steps" } },
+  ],
+  relations: [{
+    id: 901,
+    members: [{ type: "way" as const, ref: 501, role: "" }],
+    tags: { route: "foot", name: "Walk" },
+  }],
+};
+
+/**
+ * Drop undefined properties, as decoded nodes without tags carry tags:
+ * undefined
+ */
+function plain<T>(value: T): T {
+  return JSON.parse(JSON.stringify(value));
+}
+
+/**
+ * Re-encode a cache entry with one of its Uint32 header fields replaced
+ */
+async function withHeaderField(
+  encoded: Uint8Array,
+  field: number,
+  value: number,
+): Promise<Uint8Array> {
+  const bytes = await gunzip(encoded);
+  new DataView(bytes.buffer).setUint32(field * 4, value, true);
+  return await gzip(bytes);
+}
+
+Deno.test("graph cache round-trips nodes, ways and relations", async () => {
+  const decoded = await decodeCachedGraphData(await encodeOsmData(osmData));
+  assertEquals(plain(decoded), osmData);
+});
+
+Deno.test("graph cache reads BSON Binary wrapped data", async () => {
+  const encoded = await encodeOsmData(osmData);
+  const decoded = await decodeCachedGraphData({ buffer: encoded });
+  assertEquals(plain(decoded), osmData);
+});
+
+Deno.test("graph cache round-trips empty data", async () => {
+  const empty = { nodes: {}, ways: [], relations: [] };
+  assertEquals(
+    await decodeCachedGraphData(await encodeOsmData(empty)),
+    empty,
+  );
+});
+
+Deno.test("graph cache treats legacy string data as a miss", async () => {
+  const legacy = JSON.stringify(osmData);
+  assertEquals(await decodeCachedGraphData(legacy), null);
+});
+
+Deno.test("graph cache treats a wrong magic number as a miss", async () => {
+  const encoded = await encodeOsmData(osmData);
+  assertEquals(
+    await decodeCachedGraphData(await withHeaderField(encoded, 0, 0x12345678)),
+    null,
+  );
+});
+
+Deno.test("graph cache treats another format version as a miss", async () => {
+  const encoded = await encodeOsmData(osmData);
+  assertEquals(
+    await decodeCachedGraphData(await withHeaderField(encoded, 1, 999)),
+    null,
+  );
+});
@@ -0,0 +1,250 @@
+import { assert, assertAlmostEquals, assertEquals } from "jsr:@std/assert";
+import {
+  addNarrowWayPenalties,
+  connectRoadCells,
+  createGrid,
+  findNearestRoadCell,
+  findNearestRoadPoint,
+  findPathAStar,
+  getRoadSegmentIndex,
+  getRoadTypeCostFactors,
+  haversineDistanceInMeters,
+  mapRoadsToGrid,
+  parseWidthTag,
+  projectPointOntoSegment,
+  queryRoadSegments,
+} from "../services/graph.service.ts";
+
+type TestNode = { id: number; lat: number; lon: number };
+type TestWay = { id: number; nodes: number[]; tags: Record<string, string> };
+
+// A 90m flight of steps from A to B, and a residential street from A to B
+// that detours 40m to the east
+const gridBbox = { south: 44.43, west: 26.1, north: 44.4312, east: 26.101 };
+const pointA = { latitude: 44.4302, longitude: 26.1002 };
+const pointB = { latitude: 44.431, longitude: 26.1002 };
+const stairsOrStreet = {
+  nodes: {
+    1: { id: 1, lat: 44.4302, lon: 26.1002 },
+    2: { id: 2, lat: 44.431, lon: 26.1002 },
+    3: { id: 3, lat: 44.4302, lon: 26.1007 },
+    4: { id: 4, lat: 44.431, lon: 26.1007 },
+  },
+  ways: [
+    { id: 1, nodes: [1, 2], tags: { highway: "steps" } },
+    { id: 2, nodes: [1, 3, 4, 2], tags: { highway: "residential" } },
+  ],
+};
+
+/**
+ * Route from A to B and list the road types the path crosses
+ */
+function routeRoadTypes(roadTypeCostFactors: Float32Array): Set<string> {
+  const grid = createGrid(gridBbox, 4);
+  mapRoadsToGrid(stairsOrStreet, grid, roadTypeCostFactors);
+  connectRoadCells(grid);
+  const path = findPathAStar(
+    grid,
+    findNearestRoadCell(grid, pointA)!,
+    findNearestRoadCell(grid, pointB)!,
+    null,
+    roadTypeCostFactors,
+  );
+
+  assert(path.length > 0);
+  return new Set(path.map((cell) => cell.roadType!));
+}
+
+/**
+ * Deterministic pseudo-random numbers in [0, 1)
+ */
+function seededRandom(seed: number): () => number {
+  let state = seed;
+  return () => {
+    state = (state * 1664525 + 1013904223) % 4294967296;
+    return state / 4294967296;
+  };
+}
+
+/**
+ * Random footways over a 0.01 degree square, so that many segments span
+ * several 0.001 degree index buckets. Way 0 also references a missing node
+ */
+function randomRoads(random: () => number) {
+  const nodes: Record<number, TestNode> = {};
+  for (let id = 1; id <= 200; id++) {
+    nodes[id] = {
+      id,
+      lat: 44.43 + random() * 0.01,
+      lon: 26.1 + random() * 0.01,
+    };
+  }
+
+  const ways: TestWay[] = [];
+  for (let id = 0; id < 60; id++) {
+    const wayNodes = [];
+    const length = 2 + Math.floor(random() * 4);
+    for (let i = 0; i < length; i++) {
+      wayNodes.push(1 + Math.floor(random() * 200));
+    }
+    ways.push({ id, nodes: wayNodes, tags: { highway: "footway" } });
+  }
+  ways[0].nodes.splice(1, 0, 999);
+
+  return { nodes, ways };
+}
+
+/**
+ * The nearest point on any segment within maxDistance, scanning every way
+ */
+function bruteForceNearestRoadPoint(
+  point: { latitude: number; longitude: number },
+  osmData: { nodes: Record<number, TestNode>; ways: TestWay[] },
+  maxDistance: number,
+) {
+  let nearestPoint = null;
+  let minDistance = maxDistance;
+
+  for (const way of osmData.ways) {
+    for (let i = 0; i < way.nodes.length - 1; i++) {
+      const node1 = osmData.nodes[way.nodes[i]];
+      const node2 = osmData.nodes[way.nodes[i + 1]];
+      if (!node1 || !node2) continue;
+
+      const projected = projectPointOntoSegment(
+        point,
+        { latitude: node1.lat, longitude: node1.lon },
+        { latitude: node2.lat, longitude: node2.lon },
+      );
+      const distance = haversineDistanceInMeters(
+        point.latitude,
+        point.longitude,
+        projected.latitude,
+        projected.longitude,
+      );
+      if (distance < minDistance) {
+        minDistance = distance;
+        nearestPoint = projected;
+      }
+    }
+  }
+
+  return nearestPoint;
+}
+
+Deno.test("width tags are parsed to meters", () => {
+  assertEquals(parseWidthTag("2"), 2);
+  assertEquals(parseWidthTag("2,5"), 2.5);
+  assertEquals(parseWidthTag(".5"), 0.5);
+  assertEquals(parseWidthTag("3.5 M"), 3.5);
+  assertAlmostEquals(parseWidthTag("150 cm"), 1.5);
+  assertAlmostEquals(parseWidthTag("1500mm"), 1.5);
+  assertAlmostEquals(parseWidthTag("6'"), 1.8288);
+  assertAlmostEquals(parseWidthTag("4 ft"), 1.2192);
+});
+
+Deno.test("unparseable width tags are NaN", () => {
+  assert(Number.isNaN(parseWidthTag("narrow")));
+  assert(Number.isNaN(parseWidthTag("")));
+});
+
+Deno.test("segment index finds the same nearest road point as a scan", () => {
+  const random = seededRandom(42);
+  const osmData = randomRoads(random);
+
+  for (let i = 0; i < 200; i++) {
+    const point = {
+      latitude: 44.429 + random() * 0.012,
+      longitude: 26.099 + random() * 0.012,
+    };
+    for (const maxDistance of [5, 30, 150]) {
+      assertEquals(
+        findNearestRoadPoint(point, osmData, maxDistance),
+        bruteForceNearestRoadPoint(point, osmData, maxDistance),
+      );
+    }
+  }
+});
+
+Deno.test("segment index finds a segment spanning many buckets once", () => {
+  // About 1 km of road crossing ten index buckets in each direction
+  const osmData = {
+    nodes: {
+      1: { id: 1, lat: 44.43, lon: 26.1 },
+      2: { id: 2, lat: 44.44, lon: 26.11 },
+    },
+    ways: [{ id: 1, nodes: [1, 2], tags: { highway: "footway" } }],
+  };
+  const index = getRoadSegmentIndex(osmData);
+  const point = { latitude: 44.4351, longitude: 26.1049 };
+
+  assertEquals(queryRoadSegments(index, point, 300), [0]);
+  assertEquals(
+    queryRoadSegments(index, { latitude: 44.45, longitude: 26.1 }, 30),
+    [],
+  );
+  assertEquals(
+    findNearestRoadPoint(point, osmData, 30),
+    bruteForceNearestRoadPoint(point, osmData, 30),
+  );
+});
+
+Deno.test("stairs are taken only when no preference rules them out", () => {
+  assert(routeRoadTypes(getRoadTypeCostFactors(undefined)).has("steps"));
+  assert(routeRoadTypes(getRoadTypeCostFactors({})).has("steps"));
+  assert(
+    !routeRoadTypes(getRoadTypeCostFactors({ avoidStairs: true })).has(
+      "steps",
+    ),
+  );
+  // A slope limit alone also rules out steps
+  assert(
+    !routeRoadTypes(getRoadTypeCostFactors({ maxSlope: 8 })).has("steps"),
+  );
+});
+
+Deno.test("overlapping ways keep the cheapest road type", () => {
+  for (const ways of [stairsOrStreet.ways, stairsOrStreet.ways.toReversed()]) {
+    const osmData = { nodes: stairsOrStreet.nodes, ways };
+
+    // A is on both ways
+    const grid = createGrid(gridBbox, 4);
+    mapRoadsToGrid(osmData, grid, getRoadTypeCostFactors(undefined));
+    assertEquals(findNearestRoadCell(grid, pointA)!.roadType, "steps");
+
+    const stairsAvoidingGrid = createGrid(gridBbox, 4);
+    mapRoadsToGrid(
+      osmData,
+      stairsAvoidingGrid,
+      getRoadTypeCostFactors({ maxSlope: 8 }),
+    );
+    assertEquals(
+      findNearestRoadCell(stairsAvoidingGrid, pointA)!.roadType,
+      "residential",
+    );
+  }
+});
+
+Deno.test("narrow way penalties apply only to cells with a width tag", () => {
+  const osmData = {
+    nodes: stairsOrStreet.nodes,
+    ways: [
+      { id: 1, nodes: [1, 2], tags: { highway: "footway", width: "1" } },
+      { id: 2, nodes: [3, 4], tags: { highway: "footway" } },
+      { id: 3, nodes: [1, 3], tags: { highway: "footway", width: "3 m" } },
+    ],
+  };
+  const grid = createGrid(gridBbox, 4);
+  mapRoadsToGrid(osmData, grid);
+
+  const overlay = addNarrowWayPenalties(grid, null, 2)!;
+  let penalized = 0;
+  for (let i = 0; i < overlay.length; i++) {
+    assertEquals(overlay[i] > 0, grid.roadWidths[i] === 1);
+    if (overlay[i] > 0) penalized++;
+  }
+  assert(penalized > 0);
+
+  // No tagged way is narrower than 1m, so nothing is penalized
+  assertEquals(addNarrowWayPenalties(grid, null, 1), null);
+});
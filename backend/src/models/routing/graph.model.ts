@@ -1,10 +1,11 @@
+import { Buffer } from "node:buffer";
 import mongoose from "npm:mongoose@^6.7";
 
 /**
  * Represents a cached OSM graph for a specific region
  */
 export interface IRoutingGraph {
-  // Region identifier (usually city or area name)
+  // Region identifier (cache key derived from the bounding box)
   region: string;
 
   // Bounding box coordinates
@@ -15,8 +16,8 @@ export interface IRoutingGraph {
     west: number;
   };
 
-  // Graph data (serialized NetworkX graph)
-  graphData: string;
+  // Graph data (serialized pedestrian OSM nodes and ways)
+  graphData: Buffer;
 
   // Metadata
   nodeCount: number;
@@ -37,11 +38,12 @@ const routingGraphSchema = new mongoose.Schema<IRoutingGraph>({
     east: { type: Number, required: true },
     west: { type: Number, required: true },
   },
-  graphData: { type: String, required: true },
+  graphData: { type: Buffer, required: true },
   nodeCount: { type: Number, required: true },
   edgeCount: { type: Number, required: true },
   lastUpdated: { type: Date, default: Date.now },
-  lastAccessed: { type: Date, default: Date.now },
+  // Entries not read for 30 days are removed by MongoDB's TTL monitor
+  lastAccessed: { type: Date, default: Date.now, expires: 30 * 24 * 60 * 60 },
 });
 
 // Create a compound index on the bounding box for efficient spatial queries
@@ -1,6 +1,6 @@
 import NavigationHistory from "../../models/history/navigation-history.mongo.ts";
 import mongoose from "mongoose";
-import { Context, RouterContext } from "https://deno.land/x/oak/mod.ts";
+import { Context, RouterContext } from "https://deno.land/x/oak@v17.1.4/mod.ts";
 
 // Add new navigation history entry
 export const addNavigationHistory = async (ctx: Context) => {
@@ -1,4 +1,4 @@
-import { RouterContext } from "https://deno.land/x/oak/mod.ts";
+import { RouterContext } from "https://deno.land/x/oak@v17.1.4/mod.ts";
 import mongoose from "mongoose";
 import { RecommendationOrchestrationService } from "../../services/recommendation-orchestration.service.ts";
 import RecommendationCache from "../../models/recommendation/recommendation-cache.mongo.ts";
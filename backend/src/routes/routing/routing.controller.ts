@@ -23,7 +23,6 @@ export async function findAccessibleRoute(ctx: Context) {
       destination,
       avoidObstacles,
       userPreferences,
-      useOsmRouting,
     } = body;
 
     // Validate input
@@ -1,4 +1,4 @@
-import { Context } from "https://deno.land/x/oak/mod.ts";
+import { Context } from "https://deno.land/x/oak@v17.1.4/mod.ts";
 import { getFormattedPlaceTypes } from "../../utils/places-api-types.utils.ts";
 
 /**
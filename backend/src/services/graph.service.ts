@@ -3,12 +3,36 @@
  * Manages OSM grid-based routing for accessible path finding
  */
 
+import { Buffer } from "node:buffer";
 import RoutingGraph from "../models/routing/graph.model.ts";
 import MarkerModel from "../models/marker/marker.mongo.ts";
 
 // Constants for graph operations
 const GRAPH_BUFFER = 1; // km - buffer around route for graph generation
 
+// OSM data cache configuration
+const GRAPH_CACHE_BBOX_PRECISION = 1000; // snap bbox outward to 0.001 degrees
+const GRAPH_CACHE_MAX_AGE_DAYS = 7; // refetch OSM data older than this
+const GRAPH_CACHE_MAGIC = 0x4f534d42; // "OSMB"
+const GRAPH_CACHE_FORMAT_VERSION = 1; // bump when the binary layout changes
+const GRAPH_CACHE_HEADER_SIZE = 6; // Uint32 header fields
+const GRAPH_CACHE_MAX_DOCUMENT_BYTES = 15 * 1024 * 1024; // under 16 MB BSON cap
+// Decoded OSM data kept in memory, bounded by nodes plus way node references
+// (roughly 100-150 bytes each once decoded and indexed)
+const RESIDENT_GRAPH_CACHE_MAX_ELEMENTS = 2_000_000;
+
+// Overpass API configuration
+const OVERPASS_ENDPOINTS = [
+  "https://overpass-api.de/api/interpreter",
+  "https://overpass.kumi.systems/api/interpreter",
+];
+// Server-side query budget, scaled with the area of the queried bounding box
+const OVERPASS_MIN_QUERY_TIMEOUT_SECONDS = 25;
+const OVERPASS_MAX_QUERY_TIMEOUT_SECONDS = 180; // Overpass's own default
+const OVERPASS_QUERY_SECONDS_PER_KM2 = 0.2;
+const OVERPASS_RESPONSE_MARGIN_MS = 10000; // client wait beyond the budget
+const OVERPASS_MAX_SPLIT_DEPTH = 2; // split an area into at most 4 queries
+
 // Obstacle weight configuration
 const OBSTACLE_WEIGHTS = {
   STAIRS: 5,
@@ -24,6 +48,75 @@ const OBSTACLE_WEIGHTS = {
   OTHER: 1,
 };
 
+// Road type codes stored per grid cell (structure-of-arrays layout)
+const ROAD_TYPE_OTHER = 0;
+const ROAD_TYPE_CODES: Record<string, number> = {
+  footway: 1,
+  pedestrian: 2,
+  path: 3,
+  residential: 4,
+  service: 5,
+  steps: 6,
+};
+
+// Traversal cost multiplier per road type code
+const ROAD_TYPE_COST_FACTORS = new Float32Array([
+  1.0, // other
+  0.8, // footway - prefer dedicated pedestrian paths
+  0.8, // pedestrian
+  0.9, // path
+  1.1, // residential - slightly less preferred
+  1.2, // service - less preferred
+  1.0, // steps - costed like other roads unless stairs are avoided
+]);
+
+// Accessibility preference penalties, folded into the per-request costs
+const STAIRS_AVOIDANCE_FACTOR = 10; // cost multiplier for steps when avoided
+const NARROW_WAY_PENALTY = 5; // added to the overlay of too narrow cells
+
+// Cost factors for users avoiding stairs: ROAD_TYPE_COST_FACTORS with steps
+// multiplied by STAIRS_AVOIDANCE_FACTOR
+const STAIRS_AVOIDING_COST_FACTORS = ROAD_TYPE_COST_FACTORS.slice();
+STAIRS_AVOIDING_COST_FACTORS[ROAD_TYPE_CODES.steps] *= STAIRS_AVOIDANCE_FACTOR;
+
+// Turn penalty multiplier for a step, indexed by the previous and the next
+// step direction. A direction (dx, dy) in [-1, 1]^2 is coded as
+// (dx + 1) * 3 + (dy + 1), see getTurnPenaltyFactors
+const TURN_PENALTY_FACTORS = getTurnPenaltyFactors();
+
+// Highway classes used when filtering OSM ways for pedestrians
+const PEDESTRIAN_HIGHWAYS = new Set(["footway", "path", "pedestrian", "steps"]);
+const LOW_TRAFFIC_HIGHWAYS = new Set([
+  "residential",
+  "living_street",
+  "service",
+  "unclassified",
+]);
+
+// Road width in grid cells per highway class (1 cell when not listed)
+const HIGHWAY_WIDTHS = new Map<string, number>([
+  ["motorway", 4],
+  ["trunk", 4],
+  ["primary", 4],
+  ["secondary", 3],
+  ["tertiary", 2],
+  ["residential", 2],
+  ["unclassified", 2],
+]);
+
+// Bucket size (in degrees) of the road segment spatial index
+const SEGMENT_INDEX_BUCKET_SIZE = 0.001;
+
+// OSM width values such as "2", "2.5 m", "2,5", "150 cm" or "6'"
+const WIDTH_TAG_PATTERN = /^\s*(\d*[.,]?\d+)\s*(mm|cm|m|ft|')?/i;
+const WIDTH_UNIT_FACTORS: Record<string, number> = {
+  mm: 0.001,
+  cm: 0.01,
+  m: 1,
+  ft: 0.3048,
+  "'": 0.3048,
+};
+
 // Maximum distance for graph-based routing in kilometers
 const MAX_GRAPH_SIZE = 50; // Don't try to route paths longer than 50km
 
@@ -102,19 +195,35 @@ interface OsmData {
   }>;
 }
 
+// Spatial index over the road segments of an OSM dataset. Segment ids follow
+// the order of ways and their nodes, so visiting candidates in ascending id
+// order matches a linear scan over the ways
+interface RoadSegmentIndex {
+  buckets: Map<number, number[]>; // bucket key -> segment ids
+  wayIndices: Int32Array; // index into osmData.ways per segment
+  segmentIndices: Int32Array; // index of the segment within its way
+  lat1: Float64Array;
+  lon1: Float64Array;
+  lat2: Float64Array;
+  lon2: Float64Array;
+}
+
+// Per-way attributes written to every grid cell the way covers
+interface RoadAttributes {
+  wayId: number;
+  roadType: string;
+  roadTypeCode: number;
+  oneway: boolean;
+  width: number; // in grid cells
+  widthMeters: number; // tagged width in meters, 0 when untagged
+}
+
 interface GridCell {
   x: number;
   y: number;
   latitude: number;
   longitude: number;
   isRoad: boolean;
-  hasObstacle: boolean;
-  obstacleWeight: number;
-  connections: GridCell[];
-  parent?: GridCell | null;
-  f?: number; // Total cost for A*
-  g?: number; // Cost from start to current
-  h?: number; // Heuristic (estimated cost to goal)
   wayId?: number; // Original OSM way ID if applicable
   roadType?: string; // Type of road (footway, path, etc.)
   oneway?: boolean; // Whether this is a one-way road
@@ -128,8 +237,32 @@ interface Grid {
   minY: number;
   maxX: number;
   maxY: number;
+  rows: number;
+  cols: number; // row stride of the flat per-cell arrays below
+  roadTypeCodes: Uint8Array; // road type code per cell
+  roadWidths: Float32Array; // tagged road width in meters, 0 when unknown
+  // Road cell adjacency in compressed sparse row form, see connectRoadCells
+  adjacencyOffsets: Int32Array;
+  adjacencyTargets: Int32Array;
+  // Connected component per road cell (-1 for non-road cells)
+  componentLabels: Int32Array;
 }
 
+// Parsed width tag values in meters (NaN when unparseable), keyed by raw tag
+const parsedWidthTags = new Map<string, number>();
+
+// Road segment indexes, built lazily and released with their OSM data
+const roadSegmentIndexes = new WeakMap<OsmData, RoadSegmentIndex>();
+
+// Decoded OSM data kept resident in the server process, keyed by cache key
+// and ordered from least to most recently used. timestamp is when the data
+// was fetched from Overpass, elements its size for the memory bound
+const residentOsmData = new Map<
+  string,
+  { bbox: BoundingBox; osmData: OsmData; timestamp: number; elements: number }
+>();
+let residentOsmElements = 0;
+
 /**
  * Calculate a bounding box around two points
  */
@@ -199,6 +332,18 @@ function checkForObstaclesNearRoute(
 
   let nearbyObstacles = 0;
 
+  // Points further apart in latitude than this cannot be within the threshold
+  const latitudeMargin = thresholdDistanceMeters / 6371e3 * 180 / Math.PI;
+  const routeLatitudes = new Float64Array(routePoints.length);
+  let minLatitude = Infinity;
+  let maxLatitude = -Infinity;
+  for (let i = 0; i < routePoints.length; i++) {
+    const latitude = routePoints[i].latitude;
+    routeLatitudes[i] = latitude;
+    if (latitude < minLatitude) minLatitude = latitude;
+    if (latitude > maxLatitude) maxLatitude = latitude;
+  }
+
   // Check each obstacle against each point in the route
   for (const obstacle of obstacles) {
     if (
@@ -208,8 +353,21 @@ function checkForObstaclesNearRoute(
       continue; // Skip invalid obstacles
     }
 
+    const obstacleLatitude = obstacle.location.latitude;
+    if (
+      obstacleLatitude < minLatitude - latitudeMargin ||
+      obstacleLatitude > maxLatitude + latitudeMargin
+    ) {
+      continue; // Too far north or south of the whole route
+    }
+
     // Check against each point in the route
-    for (const point of routePoints) {
+    for (let i = 0; i < routePoints.length; i++) {
+      if (Math.abs(routeLatitudes[i] - obstacleLatitude) > latitudeMargin) {
+        continue;
+      }
+
+      const point = routePoints[i];
       try {
         const distance = haversineDistanceInMeters(
           point.latitude,
@@ -284,6 +442,401 @@ export async function cleanupGraphCache(
   }
 }
 
+/**
+ * Snap a bounding box outward to the cache precision so that nearby
+ * requests share the same cache entry
+ */
+function snapBoundingBox(bbox: BoundingBox): BoundingBox {
+  const p = GRAPH_CACHE_BBOX_PRECISION;
+  return {
+    north: Math.ceil(bbox.north * p) / p,
+    south: Math.floor(bbox.south * p) / p,
+    east: Math.ceil(bbox.east * p) / p,
+    west: Math.floor(bbox.west * p) / p,
+  };
+}
+
+/**
+ * Check whether the outer bounding box fully contains the inner one
+ */
+function bboxContains(outer: BoundingBox, inner: BoundingBox): boolean {
+  return outer.north >= inner.north && outer.south <= inner.south &&
+    outer.east >= inner.east && outer.west <= inner.west;
+}
+
+/**
+ * Build the cache key for a (snapped) bounding box
+ */
+function getGraphCacheKey(bbox: BoundingBox): string {
+  return `bbox:${bbox.south},${bbox.west},${bbox.north},${bbox.east}`;
+}
+
+/**
+ * Compress bytes with gzip
+ */
+export async function gzip(bytes: Uint8Array): Promise<Uint8Array> {
+  const stream = new Blob([bytes]).stream().pipeThrough(
+    new CompressionStream("gzip"),
+  );
+  return new Uint8Array(await new Response(stream).arrayBuffer());
+}
+
+/**
+ * Decompress gzip-compressed bytes
+ */
+export async function gunzip(bytes: Uint8Array): Promise<Uint8Array> {
+  const stream = new Blob([bytes]).stream().pipeThrough(
+    new DecompressionStream("gzip"),
+  );
+  return new Uint8Array(await new Response(stream).arrayBuffer());
+}
+
+/**
+ * Encode OSM data into the compact binary graph cache format.
+ *
+ * Layout: a Uint32 header (magic, version, node count, way count, way node
+ * reference count, tail length), Float64 node columns (id, lat, lon),
+ * Float64 way ids, Float64 way node references, Int32 way offsets into the
+ * references, and finally the tags and relations as UTF-8 JSON. The whole
+ * buffer is gzip-compressed.
+ */
+export async function encodeOsmData(
+  osmData: OsmData,
+): Promise<Uint8Array> {
+  const nodes = Object.values(osmData.nodes);
+  const ways = osmData.ways;
+
+  let refCount = 0;
+  for (const way of ways) {
+    refCount += way.nodes.length;
+  }
+
+  // Tags are sparse and variable-length, so they stay JSON
+  const nodeTags: Record<number, Record<string, string>> = {};
+  nodes.forEach((node, i) => {
+    if (node.tags) nodeTags[i] = node.tags;
+  });
+  const tail = new TextEncoder().encode(JSON.stringify({
+    nodeTags,
+    wayTags: ways.map((way) => way.tags),
+    relations: osmData.relations || [],
+  }));
+
+  const byteLength = GRAPH_CACHE_HEADER_SIZE * 4 +
+    (nodes.length * 3 + ways.length + refCount) * 8 +
+    (ways.length + 1) * 4 + tail.length;
+  const buffer = new ArrayBuffer(byteLength);
+
+  new Uint32Array(buffer, 0, GRAPH_CACHE_HEADER_SIZE).set([
+    GRAPH_CACHE_MAGIC,
+    GRAPH_CACHE_FORMAT_VERSION,
+    nodes.length,
+    ways.length,
+    refCount,
+    tail.length,
+  ]);
+
+  let offset = GRAPH_CACHE_HEADER_SIZE * 4;
+  const nodeIds = new Float64Array(buffer, offset, nodes.length);
+  offset += nodes.length * 8;
+  const nodeLats = new Float64Array(buffer, offset, nodes.length);
+  offset += nodes.length * 8;
+  const nodeLons = new Float64Array(buffer, offset, nodes.length);
+  offset += nodes.length * 8;
+  const wayIds = new Float64Array(buffer, offset, ways.length);
+  offset += ways.length * 8;
+  const wayRefs = new Float64Array(buffer, offset, refCount);
+  offset += refCount * 8;
+  const wayOffsets = new Int32Array(buffer, offset, ways.length + 1);
+  offset += (ways.length + 1) * 4;
+  new Uint8Array(buffer, offset, tail.length).set(tail);
+
+  nodes.forEach((node, i) => {
+    nodeIds[i] = node.id;
+    nodeLats[i] = node.lat;
+    nodeLons[i] = node.lon;
+  });
+
+  let ref = 0;
+  ways.forEach((way, i) => {
+    wayIds[i] = way.id;
+    wayOffsets[i] = ref;
+    for (const nodeId of way.nodes) {
+      wayRefs[ref++] = nodeId;
+    }
+  });
+  wayOffsets[ways.length] = ref;
+
+  return await gzip(new Uint8Array(buffer));
+}
+
+/**
+ * Decode OSM data from the binary graph cache format (see encodeOsmData)
+ */
+async function decodeOsmData(compressed: Uint8Array): Promise<OsmData> {
+  // The columns are read as views over the decompressed buffer, which gunzip
+  // returns freshly allocated and therefore 8-byte aligned
+  const { buffer } = await gunzip(compressed);
+
+  const [magic, version, nodeCount, wayCount, refCount, tailLength] =
+    new Uint32Array(buffer, 0, GRAPH_CACHE_HEADER_SIZE);
+  if (magic !== GRAPH_CACHE_MAGIC) {
+    throw new Error("Graph cache entry is not in the binary format");
+  }
+  if (version !== GRAPH_CACHE_FORMAT_VERSION) {
+    throw new Error(`Unsupported graph cache format version ${version}`);
+  }
+
+  let offset = GRAPH_CACHE_HEADER_SIZE * 4;
+  const nodeIds = new Float64Array(buffer, offset, nodeCount);
+  offset += nodeCount * 8;
+  const nodeLats = new Float64Array(buffer, offset, nodeCount);
+  offset += nodeCount * 8;
+  const nodeLons = new Float64Array(buffer, offset, nodeCount);
+  offset += nodeCount * 8;
+  const wayIds = new Float64Array(buffer, offset, wayCount);
+  offset += wayCount * 8;
+  const wayRefs = new Float64Array(buffer, offset, refCount);
+  offset += refCount * 8;
+  const wayOffsets = new Int32Array(buffer, offset, wayCount + 1);
+  offset += (wayCount + 1) * 4;
+  const { nodeTags, wayTags, relations } = JSON.parse(
+    new TextDecoder().decode(new Uint8Array(buffer, offset, tailLength)),
+  );
+
+  const nodes: Record<number, OsmNode> = {};
+  for (let i = 0; i < nodeCount; i++) {
+    nodes[nodeIds[i]] = {
+      id: nodeIds[i],
+      lat: nodeLats[i],
+      lon: nodeLons[i],
+      tags: nodeTags[i],
+    };
+  }
+
+  const ways: OsmWay[] = [];
+  for (let i = 0; i < wayCount; i++) {
+    ways.push({
+      id: wayIds[i],
+      nodes: Array.from(wayRefs.subarray(wayOffsets[i], wayOffsets[i + 1])),
+      tags: wayTags[i],
+    });
+  }
+
+  return { nodes, ways, relations };
+}
+
+/**
+ * Decode the graphData of a graph cache document. Documents written before
+ * the binary format (JSON strings) or with another format version count as
+ * cache misses and yield null
+ */
+export async function decodeCachedGraphData(
+  graphData: unknown,
+): Promise<OsmData | null> {
+  // Lean documents return the buffer as a BSON Binary wrapper
+  let bytes: Uint8Array | null = null;
+  if (graphData instanceof Uint8Array) {
+    bytes = graphData;
+  } else if (
+    graphData && typeof graphData === "object" &&
+    (graphData as { buffer?: unknown }).buffer instanceof Uint8Array
+  ) {
+    bytes = (graphData as { buffer: Uint8Array }).buffer;
+  }
+  if (!bytes) return null;
+
+  try {
+    return await decodeOsmData(bytes);
+  } catch (error) {
+    console.warn("Ignoring unreadable graph cache entry:", error);
+    return null;
+  }
+}
+
+/**
+ * Get the smallest decoded OSM data held in memory whose area covers a
+ * bounding box
+ */
+function getResidentOsmData(bbox: BoundingBox): OsmData | null {
+  const maxAge = GRAPH_CACHE_MAX_AGE_DAYS * 24 * 60 * 60 * 1000;
+  let bestKey: string | null = null;
+
+  for (const [cacheKey, entry] of residentOsmData) {
+    if (Date.now() - entry.timestamp > maxAge) {
+      residentOsmData.delete(cacheKey);
+      residentOsmElements -= entry.elements;
+      continue;
+    }
+    if (!bboxContains(entry.bbox, bbox)) continue;
+
+    if (
+      bestKey === null ||
+      entry.elements < residentOsmData.get(bestKey)!.elements
+    ) {
+      bestKey = cacheKey;
+    }
+  }
+
+  if (bestKey === null) return null;
+
+  // Move to the most recently used position
+  const best = residentOsmData.get(bestKey)!;
+  residentOsmData.delete(bestKey);
+  residentOsmData.set(bestKey, best);
+  return best.osmData;
+}
+
+/**
+ * Keep decoded OSM data in memory, evicting the least recently used entries
+ * until it fits within RESIDENT_GRAPH_CACHE_MAX_ELEMENTS
+ */
+function setResidentOsmData(
+  cacheKey: string,
+  bbox: BoundingBox,
+  osmData: OsmData,
+  lastUpdated: number,
+): void {
+  const previous = residentOsmData.get(cacheKey);
+  if (previous) {
+    residentOsmData.delete(cacheKey);
+    residentOsmElements -= previous.elements;
+  }
+
+  let elements = Object.keys(osmData.nodes).length;
+  for (const way of osmData.ways) {
+    elements += way.nodes.length;
+  }
+
+  // Data too large to share is used for this request only
+  if (elements > RESIDENT_GRAPH_CACHE_MAX_ELEMENTS) return;
+
+  for (const [oldestKey, oldest] of residentOsmData) {
+    if (residentOsmElements + elements <= RESIDENT_GRAPH_CACHE_MAX_ELEMENTS) {
+      break;
+    }
+    residentOsmData.delete(oldestKey);
+    residentOsmElements -= oldest.elements;
+  }
+
+  residentOsmData.set(cacheKey, {
+    bbox,
+    osmData,
+    timestamp: lastUpdated,
+    elements,
+  });
+  residentOsmElements += elements;
+}
+
+/**
+ * Load filtered OSM data covering a bounding box from the graph cache,
+ * preferring the smallest cached area that contains it
+ */
+async function loadCachedOsmData(
+  bbox: BoundingBox,
+  allowStale = false,
+): Promise<
+  {
+    cacheKey: string;
+    bbox: BoundingBox;
+    osmData: OsmData;
+    lastUpdated: number;
+  } | null
+> {
+  try {
+    const cutoffDate = new Date(
+      Date.now() - (GRAPH_CACHE_MAX_AGE_DAYS * 24 * 60 * 60 * 1000),
+    );
+    const query: Record<string, unknown> = {
+      "bbox.north": { $gte: bbox.north },
+      "bbox.south": { $lte: bbox.south },
+      "bbox.east": { $gte: bbox.east },
+      "bbox.west": { $lte: bbox.west },
+    };
+    if (!allowStale) query.lastUpdated = { $gte: cutoffDate };
+
+    const cached = await RoutingGraph.findOne(query)
+      .sort({ nodeCount: 1 })
+      .lean();
+
+    if (!cached) return null;
+
+    const osmData = await decodeCachedGraphData(cached.graphData);
+    if (!osmData) {
+      // Remove the unreadable entry so it stops shadowing the area
+      RoutingGraph.deleteOne({ _id: cached._id }).catch((error: unknown) => {
+        console.warn("Failed to remove unreadable graph cache entry:", error);
+      });
+      return null;
+    }
+
+    // Refresh the access time without blocking the request
+    RoutingGraph.updateOne({ _id: cached._id }, {
+      lastAccessed: new Date(),
+    }).catch((error: unknown) => {
+      console.warn("Failed to update graph cache access time:", error);
+    });
+
+    return {
+      cacheKey: cached.region,
+      bbox: cached.bbox,
+      osmData,
+      lastUpdated: new Date(cached.lastUpdated).getTime(),
+    };
+  } catch (error) {
+    console.error("Error reading graph cache:", error);
+    return null; // Treat cache errors as a miss
+  }
+}
+
+/**
+ * Store filtered OSM data for a bounding box in the graph cache. Errors are
+ * logged rather than thrown, so callers need not wait for the write
+ */
+async function storeCachedOsmData(
+  cacheKey: string,
+  bbox: BoundingBox,
+  osmData: OsmData,
+): Promise<void> {
+  try {
+    const encoded = await encodeOsmData(osmData);
+    if (encoded.byteLength > GRAPH_CACHE_MAX_DOCUMENT_BYTES) {
+      console.warn(
+        `Skipping graph cache write for ${cacheKey}: ${encoded.byteLength} ` +
+          "bytes exceeds the MongoDB document limit",
+      );
+      return;
+    }
+
+    let edgeCount = 0;
+    for (const way of osmData.ways) {
+      edgeCount += Math.max(0, way.nodes.length - 1);
+    }
+
+    await RoutingGraph.updateOne(
+      { region: cacheKey },
+      {
+        region: cacheKey,
+        bbox,
+        // Share the encoded bytes with the Buffer instead of copying them
+        graphData: Buffer.from(
+          encoded.buffer,
+          encoded.byteOffset,
+          encoded.byteLength,
+        ),
+        nodeCount: Object.keys(osmData.nodes).length,
+        edgeCount,
+        lastUpdated: new Date(),
+        lastAccessed: new Date(),
+      },
+      { upsert: true },
+    );
+  } catch (error) {
+    console.error("Error writing graph cache:", error);
+    // Don't throw, routing can proceed without the cache
+  }
+}
+
 /**
  * Filter OSM data to keep only pedestrian-relevant ways and their nodes
  */
@@ -301,8 +854,7 @@ function filterOsmDataForPedestrians(osmData: OsmData): OsmData {
 
     // Priority 1: Dedicated pedestrian infrastructure
     if (
-      tags.highway === "footway" || tags.highway === "path" ||
-      tags.highway === "pedestrian" || tags.highway === "steps" ||
+      PEDESTRIAN_HIGHWAYS.has(tags.highway) ||
       tags.footway || tags.path || tags.pedestrian
     ) {
       return true;
@@ -314,10 +866,7 @@ function filterOsmDataForPedestrians(osmData: OsmData): OsmData {
     }
 
     // Priority 3: Low-traffic roads suitable for pedestrians
-    if (
-      tags.highway === "residential" || tags.highway === "living_street" ||
-      tags.highway === "service" || tags.highway === "unclassified"
-    ) {
+    if (LOW_TRAFFIC_HIGHWAYS.has(tags.highway)) {
       // Check if sidewalk exists or foot access is explicitly allowed
       if (tags.sidewalk || tags.foot === "yes" || !tags.foot) {
         return true;
@@ -385,102 +934,278 @@ function calculateRouteDistance(
   return totalDistance;
 }
 
+/**
+ * Error from an Overpass request, flagged when a smaller query may succeed
+ */
+class OverpassError extends Error {
+  constructor(message: string, readonly splittable: boolean) {
+    super(message);
+    this.name = "OverpassError";
+  }
+}
+
+/**
+ * Get the server-side Overpass timeout in seconds for a bounding box, so that
+ * large areas get up to Overpass's default budget and small ones fail fast
+ */
+function getOverpassQueryTimeout(bbox: BoundingBox): number {
+  const middleLat = (bbox.north + bbox.south) / 2;
+  const heightKm = haversineDistanceInMeters(
+    bbox.south,
+    bbox.west,
+    bbox.north,
+    bbox.west,
+  ) / 1000;
+  const widthKm = haversineDistanceInMeters(
+    middleLat,
+    bbox.west,
+    middleLat,
+    bbox.east,
+  ) / 1000;
+
+  return Math.round(Math.min(
+    OVERPASS_MAX_QUERY_TIMEOUT_SECONDS,
+    OVERPASS_MIN_QUERY_TIMEOUT_SECONDS +
+      heightKm * widthKm * OVERPASS_QUERY_SECONDS_PER_KM2,
+  ));
+}
+
+/**
+ * Build the Overpass query for pedestrian-relevant ways in a bounding box
+ */
+function buildOverpassQuery(
+  bbox: BoundingBox,
+  timeoutSeconds: number,
+): string {
+  const area = `${bbox.south},${bbox.west},${bbox.north},${bbox.east}`;
+
+  // Enhanced Overpass API query to get more detailed road information
+  return `
+    [out:json][timeout:${timeoutSeconds}];
+    (
+      way["highway"](${area});
+      way["footway"](${area});
+      way["path"](${area});
+      way["cycleway"](${area});
+      way["pedestrian"](${area});
+      way["steps"](${area});
+      relation["route"="foot"](${area});
+      relation["route"="hiking"](${area});
+    );
+    (._;>;);
+    out body;
+  `;
+}
+
+/**
+ * Process the Overpass API result into our format
+ */
+function parseOverpassElements(
+  elements: Array<Record<string, unknown>>,
+): OsmData {
+  const nodes: Record<number, OsmNode> = {};
+  const ways: OsmWay[] = [];
+  const relations: NonNullable<OsmData["relations"]> = [];
+
+  for (const element of elements) {
+    const { id, lat, lon } = element;
+    if (typeof id !== "number") continue;
+    const tags = typeof element.tags === "object" && element.tags !== null
+      ? element.tags as Record<string, string>
+      : undefined;
+
+    if (element.type === "node") {
+      if (typeof lat !== "number" || typeof lon !== "number") continue;
+      nodes[id] = { id, lat, lon, tags };
+    } else if (element.type === "way") {
+      // Check for all pedestrian-relevant tags
+      if (
+        tags && Array.isArray(element.nodes) &&
+        (tags.highway ||
+          tags.footway ||
+          tags.path ||
+          tags.cycleway ||
+          tags.pedestrian ||
+          tags.steps)
+      ) {
+        ways.push({
+          id,
+          nodes: element.nodes,
+          tags,
+        });
+      }
+    } else if (element.type === "relation") {
+      if (
+        tags && Array.isArray(element.members) &&
+        (tags.route === "foot" ||
+          tags.route === "hiking")
+      ) {
+        relations.push({
+          id,
+          members: element.members,
+          tags,
+        });
+      }
+    }
+  }
+
+  return { nodes, ways, relations };
+}
+
+/**
+ * Run a single Overpass query, trying each mirror in turn
+ */
+async function queryOverpass(
+  bbox: BoundingBox,
+  deadline: number,
+): Promise<OsmData> {
+  const timeoutSeconds = getOverpassQueryTimeout(bbox);
+  const query = buildOverpassQuery(bbox, timeoutSeconds);
+  let lastError = new OverpassError("No Overpass endpoints configured", false);
+
+  for (const endpoint of OVERPASS_ENDPOINTS) {
+    const remaining = deadline - Date.now();
+    if (remaining <= 0) {
+      throw new OverpassError("Overpass fetch deadline exceeded", false);
+    }
+
+    try {
+      const response = await fetch(endpoint, {
+        method: "POST",
+        body: query,
+        headers: {
+          "Content-Type": "application/x-www-form-urlencoded",
+        },
+        signal: AbortSignal.timeout(
+          Math.min(
+            timeoutSeconds * 1000 + OVERPASS_RESPONSE_MARGIN_MS,
+            remaining,
+          ),
+        ),
+      });
+
+      if (!response.ok) {
+        // A gateway timeout points at an oversized query
+        lastError = new OverpassError(
+          `Overpass API error: ${response.status}`,
+          response.status === 504,
+        );
+        continue;
+      }
+
+      const data = await response.json();
+
+      // Overpass reports query timeouts in a remark alongside partial data
+      if (
+        typeof data.remark === "string" && data.remark.includes("runtime error")
+      ) {
+        throw new OverpassError(`Overpass API ${data.remark}`, true);
+      }
+
+      return parseOverpassElements(data.elements ?? []);
+    } catch (error) {
+      if (error instanceof OverpassError && error.splittable) throw error;
+
+      // Client-side timeouts and network errors say nothing about the query
+      // size, so they move on to the next mirror rather than split the area
+      lastError = error instanceof OverpassError ? error : new OverpassError(
+        `Overpass request to ${endpoint} failed: ${error}`,
+        false,
+      );
+    }
+  }
+
+  throw lastError;
+}
+
+/**
+ * Merge OSM data fetched for adjacent bounding boxes
+ */
+function mergeOsmData(first: OsmData, second: OsmData): OsmData {
+  // Ways and relations crossing the split line are returned by both halves
+  const wayIds = new Set(first.ways.map((way) => way.id));
+  const relationIds = new Set((first.relations || []).map((rel) => rel.id));
+
+  return {
+    nodes: Object.assign(first.nodes, second.nodes),
+    ways: first.ways.concat(
+      second.ways.filter((way) => !wayIds.has(way.id)),
+    ),
+    relations: (first.relations || []).concat(
+      (second.relations || []).filter((rel) => !relationIds.has(rel.id)),
+    ),
+  };
+}
+
+/**
+ * Query Overpass for a bounding box, halving it along its longer side
+ * when the server cannot answer the whole area in one request. No request
+ * starts after the deadline (a Date.now() timestamp)
+ */
+async function fetchOsmDataChunked(
+  bbox: BoundingBox,
+  depth: number,
+  deadline: number,
+): Promise<OsmData> {
+  try {
+    return await queryOverpass(bbox, deadline);
+  } catch (error) {
+    if (
+      !(error instanceof OverpassError) || !error.splittable ||
+      depth >= OVERPASS_MAX_SPLIT_DEPTH
+    ) {
+      throw error;
+    }
+
+    console.warn(`${error.message}, splitting bounding box (depth ${depth})`);
+
+    let halves: [BoundingBox, BoundingBox];
+    if (bbox.north - bbox.south >= bbox.east - bbox.west) {
+      const middle = (bbox.north + bbox.south) / 2;
+      halves = [
+        { ...bbox, north: middle },
+        { ...bbox, south: middle },
+      ];
+    } else {
+      const middle = (bbox.east + bbox.west) / 2;
+      halves = [
+        { ...bbox, east: middle },
+        { ...bbox, west: middle },
+      ];
+    }
+
+    const [first, second] = await Promise.all(
+      halves.map((half) => fetchOsmDataChunked(half, depth + 1, deadline)),
+    );
+    return mergeOsmData(first, second);
+  }
+}
+
 /**
  * Fetch OSM data from Overpass API for a given bounding box
  */
 async function fetchOsmData(bbox: BoundingBox): Promise<OsmData> {
   try {
-    // Enhanced Overpass API query to get more detailed road information
-    const query = `
-      [out:json];
-      (
-        way["highway"](${bbox.south},${bbox.west},${bbox.north},${bbox.east});
-        way["footway"](${bbox.south},${bbox.west},${bbox.north},${bbox.east});
-        way["path"](${bbox.south},${bbox.west},${bbox.north},${bbox.east});
-        way["cycleway"](${bbox.south},${bbox.west},${bbox.north},${bbox.east});
-        way["pedestrian"](${bbox.south},${bbox.west},${bbox.north},${bbox.east});
-        way["steps"](${bbox.south},${bbox.west},${bbox.north},${bbox.east});
-        relation["route"="foot"](${bbox.south},${bbox.west},${bbox.north},${bbox.east});
-        relation["route"="hiking"](${bbox.south},${bbox.west},${bbox.north},${bbox.east});
-      );
-      (._;>;);
-      out body;
-    `;
-
     console.log("Fetching OSM data from Overpass API...");
-    const response = await fetch("https://overpass-api.de/api/interpreter", {
-      method: "POST",
-      body: query,
-      headers: {
-        "Content-Type": "application/x-www-form-urlencoded",
-      },
-    });
 
-    if (!response.ok) {
-      throw new Error(`Overpass API error: ${response.status}`);
-    }
-
-    const data = await response.json();
-
-    // Process the Overpass API result into our format
-    const nodes: Record<number, OsmNode> = {};
-    const ways: OsmWay[] = [];
-    const relations: Array<{
-      id: number;
-      members: Array<{
-        type: "node" | "way" | "relation";
-        ref: number;
-        role: string;
-      }>;
-      tags: Record<string, string>;
-    }> = [];
-
-    for (const element of data.elements) {
-      if (element.type === "node") {
-        nodes[element.id] = {
-          id: element.id,
-          lat: element.lat,
-          lon: element.lon,
-          tags: element.tags,
-        };
-      } else if (element.type === "way") {
-        // Check for all pedestrian-relevant tags
-        if (
-          element.tags &&
-          (element.tags.highway ||
-            element.tags.footway ||
-            element.tags.path ||
-            element.tags.cycleway ||
-            element.tags.pedestrian ||
-            element.tags.steps)
-        ) {
-          ways.push({
-            id: element.id,
-            nodes: element.nodes,
-            tags: element.tags,
-          });
-        }
-      } else if (element.type === "relation") {
-        if (
-          element.tags &&
-          (element.tags.route === "foot" ||
-            element.tags.route === "hiking")
-        ) {
-          relations.push({
-            id: element.id,
-            members: element.members,
-            tags: element.tags,
-          });
-        }
-      }
-    }
+    // Leave room for the full query and one round of split queries, which
+    // run in parallel with budgets no larger than the full query's
+    const requestTimeoutMs = getOverpassQueryTimeout(bbox) * 1000 +
+      OVERPASS_RESPONSE_MARGIN_MS;
+    const osmData = await fetchOsmDataChunked(
+      bbox,
+      0,
+      Date.now() + 2 * requestTimeoutMs,
+    );
 
     console.log(
       `Processed ${
-        Object.keys(nodes).length
-      } nodes, ${ways.length} ways, and ${relations.length} relations`,
+        Object.keys(osmData.nodes).length
+      } nodes, ${osmData.ways.length} ways, and ${
+        osmData.relations?.length ?? 0
+      } relations`,
     );
-    return { nodes, ways, relations };
+    return osmData;
   } catch (error) {
     console.error("Error fetching OSM data:", error);
     // Return an empty dataset as fallback
@@ -491,7 +1216,7 @@ async function fetchOsmData(bbox: BoundingBox): Promise<OsmData> {
 /**
  * Create a grid based on the bounding box and cell size
  */
-function createGrid(bbox: BoundingBox, cellSize: number): Grid {
+export function createGrid(bbox: BoundingBox, cellSize: number): Grid {
   // Calculate the distance in meters
   const distanceNS = haversineDistanceInMeters(
     bbox.north,
@@ -543,9 +1268,6 @@ function createGrid(bbox: BoundingBox, cellSize: number): Grid {
         latitude,
         longitude,
         isRoad: false,
-        hasObstacle: false,
-        obstacleWeight: 0,
-        connections: [],
       };
     }
   }
@@ -558,38 +1280,86 @@ function createGrid(bbox: BoundingBox, cellSize: number): Grid {
     minY: 0,
     maxX: numCellsLon - 1,
     maxY: numCellsLat - 1,
+    rows: numCellsLat,
+    cols: numCellsLon,
+    roadTypeCodes: new Uint8Array(totalCells),
+    roadWidths: new Float32Array(totalCells),
+    adjacencyOffsets: new Int32Array(totalCells + 1),
+    adjacencyTargets: new Int32Array(0),
+    componentLabels: new Int32Array(totalCells).fill(-1),
   };
 }
 
 /**
- * Map OSM roads to the grid
+ * Keep only the ways with a segment whose extent overlaps a bounding box, so
+ * that data cached for a larger area is not rasterized outside the grid. The
+ * nodes are shared with the input
  */
-function mapRoadsToGrid(osmData: OsmData, grid: Grid): void {
+function clipOsmDataToBbox(osmData: OsmData, bbox: BoundingBox): OsmData {
+  const ways = osmData.ways.filter((way) => {
+    let previous: OsmNode | null = null;
+    for (const nodeId of way.nodes) {
+      const node = osmData.nodes[nodeId];
+      if (!node) continue;
+      if (
+        previous &&
+        Math.max(previous.lat, node.lat) >= bbox.south &&
+        Math.min(previous.lat, node.lat) <= bbox.north &&
+        Math.max(previous.lon, node.lon) >= bbox.west &&
+        Math.min(previous.lon, node.lon) <= bbox.east
+      ) {
+        return true;
+      }
+      previous = node;
+    }
+    return false;
+  });
+
+  return { ...osmData, ways };
+}
+
+/**
+ * Map OSM roads to the grid. Where ways overlap, cells keep the road type
+ * that is cheapest under the given cost factors, which should be the ones
+ * the search will use
+ */
+export function mapRoadsToGrid(
+  osmData: OsmData,
+  grid: Grid,
+  roadTypeCostFactors: Float32Array = ROAD_TYPE_COST_FACTORS,
+): void {
   console.log("Mapping OSM roads to grid...");
 
-  // Process each way (road) in the OSM data
+  // Process each way (road) in the OSM data in a single pass over its nodes
   for (const way of osmData.ways) {
     // Skip if the way has fewer than 2 nodes
     if (way.nodes.length < 2) continue;
 
-    // Get all the nodes for this way
-    const wayNodes = way.nodes
-      .filter((nodeId) => osmData.nodes[nodeId])
-      .map((nodeId) => osmData.nodes[nodeId]);
-
-    // Skip if we don't have enough valid nodes
-    if (wayNodes.length < 2) continue;
-
-    // Process each segment of the way
-    for (let i = 0; i < wayNodes.length - 1; i++) {
-      const node1 = wayNodes[i];
-      const node2 = wayNodes[i + 1];
+    // Attributes shared by every segment of the way
+    const roadType = getWayRoadType(way);
+    const road: RoadAttributes = {
+      wayId: way.id,
+      roadType,
+      roadTypeCode: ROAD_TYPE_CODES[roadType] ?? ROAD_TYPE_OTHER,
+      oneway: way.tags.oneway === "yes",
+      width: getRoadWidth(way),
+      widthMeters: (way.tags.width && parseWidthTag(way.tags.width)) || 0,
+    };
+
+    // Rasterize each segment between consecutive valid nodes, reusing the
+    // grid coordinates of a segment's end as the next segment's start
+    let previous: { x: number; y: number } | null = null;
+    for (const nodeId of way.nodes) {
+      const node = osmData.nodes[nodeId];
 
       // Skip invalid nodes
-      if (!node1 || !node2) continue;
+      if (!node) continue;
 
-      // Rasterize the line segment onto the grid
-      rasterizeLine(node1.lat, node1.lon, node2.lat, node2.lon, grid, way);
+      const coords = getGridCoordinates(node.lat, node.lon, grid);
+      if (previous) {
+        rasterizeLine(previous, coords, grid, road, roadTypeCostFactors);
+      }
+      previous = coords;
     }
   }
 
@@ -597,54 +1367,58 @@ function mapRoadsToGrid(osmData: OsmData, grid: Grid): void {
 }
 
 /**
- * Rasterize a line segment onto the grid
+ * Determine the road type of an OSM way
+ */
+function getWayRoadType(way: OsmWay): string {
+  if (way.tags.highway) return way.tags.highway;
+  if (way.tags.footway) return "footway";
+  if (way.tags.path) return "path";
+  if (way.tags.cycleway) return "cycleway";
+  if (way.tags.pedestrian) return "pedestrian";
+  return "unknown";
+}
+
+/**
+ * Rasterize a line segment (in grid coordinates) onto the grid
  */
 function rasterizeLine(
-  lat1: number,
-  lon1: number,
-  lat2: number,
-  lon2: number,
+  start: { x: number; y: number },
+  end: { x: number; y: number },
   grid: Grid,
-  way: OsmWay,
+  road: RoadAttributes,
+  roadTypeCostFactors: Float32Array,
 ): void {
-  // Get grid coordinates for the start and end points
-  const start = getGridCoordinates(lat1, lon1, grid);
-  const end = getGridCoordinates(lat2, lon2, grid);
-
   // Get the cells along the line using Bresenham's algorithm
-  const roadWidth = getRoadWidth(way);
   const lineCells = bresenhamWideLine(
     start.x,
     start.y,
     end.x,
     end.y,
-    roadWidth,
+    road.width,
   );
 
-  // Mark each cell as a road and add the way ID and road type
-  for (const cell of lineCells) {
-    const { x, y } = cell;
+  const costFactor = roadTypeCostFactors[road.roadTypeCode];
+
+  // Mark each cell as a road and add the way ID and road type. Where ways
+  // overlap, the cell keeps the cheapest road type so that a footway running
+  // alongside a service road is not costed as the service road
+  for (const { x, y } of lineCells) {
     if (x >= 0 && x <= grid.maxX && y >= 0 && y <= grid.maxY) {
-      grid.cells[y][x].isRoad = true;
-      grid.cells[y][x].wayId = way.id;
-
-      // Set road type
-      if (way.tags.highway) {
-        grid.cells[y][x].roadType = way.tags.highway;
-      } else if (way.tags.footway) {
-        grid.cells[y][x].roadType = "footway";
-      } else if (way.tags.path) {
-        grid.cells[y][x].roadType = "path";
-      } else if (way.tags.cycleway) {
-        grid.cells[y][x].roadType = "cycleway";
-      } else if (way.tags.pedestrian) {
-        grid.cells[y][x].roadType = "pedestrian";
-      } else {
-        grid.cells[y][x].roadType = "unknown";
+      const index = y * grid.cols + x;
+      const cell = grid.cells[y][x];
+      if (
+        cell.isRoad &&
+        roadTypeCostFactors[grid.roadTypeCodes[index]] < costFactor
+      ) {
+        continue;
       }
 
-      // Check if the road is one-way
-      grid.cells[y][x].oneway = way.tags.oneway === "yes";
+      cell.isRoad = true;
+      cell.wayId = road.wayId;
+      cell.roadType = road.roadType;
+      cell.oneway = road.oneway;
+      grid.roadTypeCodes[index] = road.roadTypeCode;
+      grid.roadWidths[index] = road.widthMeters;
     }
   }
 }
@@ -660,28 +1434,9 @@ function getGridCoordinates(
   const latRange = grid.bbox.north - grid.bbox.south;
   const lonRange = grid.bbox.east - grid.bbox.west;
 
-  // Calculate the number of cells in each direction
-  const numCellsLat = Math.ceil(
-    haversineDistanceInMeters(
-      grid.bbox.north,
-      (grid.bbox.east + grid.bbox.west) / 2,
-      grid.bbox.south,
-      (grid.bbox.east + grid.bbox.west) / 2,
-    ) / grid.cellSize,
-  );
-
-  const numCellsLon = Math.ceil(
-    haversineDistanceInMeters(
-      (grid.bbox.north + grid.bbox.south) / 2,
-      grid.bbox.east,
-      (grid.bbox.north + grid.bbox.south) / 2,
-      grid.bbox.west,
-    ) / grid.cellSize,
-  );
-
-  // Calculate the grid coordinates
-  const x = Math.floor((lon - grid.bbox.west) / lonRange * numCellsLon);
-  const y = Math.floor((grid.bbox.north - lat) / latRange * numCellsLat);
+  // Calculate the grid coordinates (cell counts are fixed at grid creation)
+  const x = Math.floor((lon - grid.bbox.west) / lonRange * grid.cols);
+  const y = Math.floor((grid.bbox.north - lat) / latRange * grid.rows);
 
   return { x, y };
 }
@@ -742,14 +1497,15 @@ function bresenhamWideLine(
     result.push(...above, ...below);
   }
 
-  // Remove duplicates
-  const uniqueCells = new Map<string, { x: number; y: number }>();
-  for (const cell of result) {
-    const key = `${cell.x},${cell.y}`;
-    uniqueCells.set(key, cell);
-  }
-
-  return Array.from(uniqueCells.values());
+  // Remove duplicates, keyed by a number rather than a formatted string
+  // (exact while |y| stays below 2^19 cells)
+  const seen = new Set<number>();
+  return result.filter((cell) => {
+    const key = cell.x * 0x100000 + cell.y;
+    if (seen.has(key)) return false;
+    seen.add(key);
+    return true;
+  });
 }
 
 /**
@@ -797,50 +1553,45 @@ function bresenhamLine(
 function getRoadWidth(way: OsmWay): number {
   const tags = way.tags;
 
-  // Default width (in grid cells)
-  let width = 1;
-
-  // Adjust width based on road type
-  if (tags.highway) {
-    switch (tags.highway) {
-      case "motorway":
-      case "trunk":
-      case "primary":
-        width = 4;
-        break;
-      case "secondary":
-        width = 3;
-        break;
-      case "tertiary":
-      case "residential":
-      case "unclassified":
-        width = 2;
-        break;
-      case "footway":
-      case "path":
-      case "track":
-      case "steps":
-        width = 1;
-        break;
-      default:
-        width = 1;
-    }
-  }
+  // Width (in grid cells) based on road type, defaulting to 1
+  let width = (tags.highway && HIGHWAY_WIDTHS.get(tags.highway)) || 1;
 
   // Check if there's an explicit width tag
-  if (tags.width && !isNaN(parseFloat(tags.width))) {
-    const explicitWidth = parseFloat(tags.width);
-    // Convert meters to grid cells (approximately)
-    width = Math.max(1, Math.round(explicitWidth));
+  if (tags.width) {
+    const explicitWidth = parseWidthTag(tags.width);
+    if (!isNaN(explicitWidth)) {
+      // Convert meters to grid cells (approximately)
+      width = Math.max(1, Math.round(explicitWidth));
+    }
   }
 
   return width;
 }
 
 /**
- * Connect adjacent road cells in the grid to create the navigation graph
+ * Parse an OSM width tag into meters, returning NaN if it can't be parsed.
+ * Width values repeat heavily across ways, so results are memoized
+ */
+export function parseWidthTag(value: string): number {
+  const cached = parsedWidthTags.get(value);
+  if (cached !== undefined) return cached;
+
+  const match = WIDTH_TAG_PATTERN.exec(value);
+  const meters = match
+    ? parseFloat(match[1].replace(",", ".")) *
+      WIDTH_UNIT_FACTORS[(match[2] || "m").toLowerCase()]
+    : NaN;
+
+  parsedWidthTags.set(value, meters);
+  return meters;
+}
+
+/**
+ * Connect adjacent road cells in the grid to create the navigation graph.
+ * Neighbors of cell i are adjacencyTargets[adjacencyOffsets[i] ..
+ * adjacencyOffsets[i + 1]), stored as flat cell indices (y * cols + x)
  */
-function connectRoadCells(grid: Grid): void {
+export function connectRoadCells(grid: Grid): void {
   console.log("Connecting road cells...");
 
   // Define neighbor directions (8-way connectivity)
@@ -855,16 +1606,16 @@ function connectRoadCells(grid: Grid): void {
     { dx: 1, dy: -1 }, // top-right
   ];
 
+  const offsets = grid.adjacencyOffsets;
+  const targets: number[] = [];
+
   // Connect each road cell to its neighboring road cells
   for (let y = 0; y <= grid.maxY; y++) {
     for (let x = 0; x <= grid.maxX; x++) {
-      const cell = grid.cells[y][x];
+      offsets[y * grid.cols + x] = targets.length;
 
       // Skip non-road cells
-      if (!cell.isRoad) continue;
-
-      // Clear any previous connections
-      cell.connections = [];
+      if (!grid.cells[y][x].isRoad) continue;
 
       // Connect to neighboring road cells
       for (const dir of directions) {
@@ -873,32 +1624,148 @@ function connectRoadCells(grid: Grid): void {
 
         // Check if neighbor is within bounds
         if (nx >= 0 && nx <= grid.maxX && ny >= 0 && ny <= grid.maxY) {
-          const neighbor = grid.cells[ny][nx];
-
           // Only connect to other road cells
-          if (neighbor.isRoad) {
-            cell.connections.push(neighbor);
+          if (grid.cells[ny][nx].isRoad) {
+            targets.push(ny * grid.cols + nx);
           }
         }
       }
     }
   }
+  offsets[offsets.length - 1] = targets.length;
+  grid.adjacencyTargets = Int32Array.from(targets);
+
+  labelRoadComponents(grid);
 
   console.log("Finished connecting road cells");
 }
 
 /**
- * Apply obstacles to the grid, increasing the weight of cells near obstacles
+ * Label the connected components of the road network with a breadth-first
+ * flood fill, so unreachable destinations can be rejected without running A*
  */
-function applyObstaclesToGrid(
+function labelRoadComponents(grid: Grid): void {
+  const { adjacencyOffsets, adjacencyTargets, componentLabels } = grid;
+  const queue = new Int32Array(componentLabels.length);
+  let componentCount = 0;
+
+  for (let seed = 0; seed < componentLabels.length; seed++) {
+    // Skip non-road cells and cells that already have a component
+    if (componentLabels[seed] !== -1 || !isRoadCell(grid, seed)) continue;
+
+    const label = componentCount++;
+    let head = 0;
+    let tail = 0;
+    queue[tail++] = seed;
+    componentLabels[seed] = label;
+
+    while (head < tail) {
+      const cell = queue[head++];
+      for (
+        let e = adjacencyOffsets[cell];
+        e < adjacencyOffsets[cell + 1];
+        e++
+      ) {
+        const neighbor = adjacencyTargets[e];
+        if (componentLabels[neighbor] === -1) {
+          componentLabels[neighbor] = label;
+          queue[tail++] = neighbor;
+        }
+      }
+    }
+  }
+
+  console.log(`Road network has ${componentCount} connected components`);
+}
+
+/**
+ * Check whether a flat cell index is a road cell
+ */
+function isRoadCell(grid: Grid, index: number): boolean {
+  const x = index % grid.cols;
+  return grid.cells[(index - x) / grid.cols][x].isRoad;
+}
+
+/**
+ * Get the road type cost factors for a user's preferences. Preferences are
+ * fixed for a request, so they are folded into the per road type table once
+ * rather than checked for every edge the search relaxes
+ */
+export function getRoadTypeCostFactors(
+  userPreferences: RoutingParams["userPreferences"],
+): Float32Array {
+  // Steps exceed any maximum slope, so a slope limit also avoids them
+  const avoidStairs = !!userPreferences &&
+    (userPreferences.avoidStairs === true ||
+      typeof userPreferences.maxSlope === "number");
+  return avoidStairs ? STAIRS_AVOIDING_COST_FACTORS : ROAD_TYPE_COST_FACTORS;
+}
+
+/**
+ * Penalize road cells whose tagged width is below the user's minimum width
+ * by adding to the per-request overlay, allocating it if needed. Cells with
+ * no width tag are left alone
+ */
+export function addNarrowWayPenalties(
+  grid: Grid,
+  overlay: Float32Array | null,
+  minimumWidth: number,
+): Float32Array | null {
+  const { roadWidths } = grid;
+
+  for (let i = 0; i < roadWidths.length; i++) {
+    const width = roadWidths[i];
+    if (width > 0 && width < minimumWidth) {
+      overlay ??= new Float32Array(roadWidths.length);
+      overlay[i] += NARROW_WAY_PENALTY;
+    }
+  }
+
+  return overlay;
+}
+
+/**
+ * Build the obstacle overlay for a grid: the accumulated weight of nearby
+ * obstacles per cell. The grid itself is left untouched so it can be shared
+ * between requests with different obstacles
+ */
+function buildObstacleOverlay(
   grid: Grid,
   obstacles: any[],
   proximityThreshold: number = 20, // meters
-): void {
-  if (!obstacles || obstacles.length === 0) return;
+): Float32Array {
+  const overlay = new Float32Array(grid.rows * grid.cols);
+  if (!obstacles || obstacles.length === 0) return overlay;
 
   console.log(`Applying ${obstacles.length} obstacles to grid...`);
 
+  // Define the radius of influence in grid cells
+  // Based on the proximity threshold and cell size
+  const influenceRadius = Math.ceil(proximityThreshold / grid.cellSize);
+  const kernelSize = 2 * influenceRadius + 1;
+
+  // The decay kernel is the same for every obstacle, so build it once.
+  // Use exponential decay: weight decreases as distance increases
+  const kernel = new Float32Array(kernelSize * kernelSize);
+  for (let dy = -influenceRadius; dy <= influenceRadius; dy++) {
+    for (let dx = -influenceRadius; dx <= influenceRadius; dx++) {
+      // Calculate distance from obstacle (in grid cells)
+      const distance = Math.sqrt(dx * dx + dy * dy);
+
+      // Cells outside the influence radius keep a zero contribution
+      if (distance > influenceRadius) continue;
+
+      const k = (dy + influenceRadius) * kernelSize + (dx + influenceRadius);
+      const distanceRatio = 1 - (distance / influenceRadius);
+      kernel[k] = distanceRatio * distanceRatio;
+    }
+  }
+
+  // Sum obstacle scores per cell first so that obstacles reported at the same
+  // spot stamp the kernel once
+  const paddedCols = grid.cols + 2 * influenceRadius;
+  const paddedRows = grid.rows + 2 * influenceRadius;
+  const cellScores = new Map<number, number>();
   for (const obstacle of obstacles) {
     if (
       !obstacle.location || !obstacle.location.latitude ||
@@ -921,50 +1788,48 @@ function applyObstaclesToGrid(
       grid,
     );
 
-    // Define the radius of influence in grid cells
-    // Based on the proximity threshold and cell size
-    const influenceRadius = Math.ceil(proximityThreshold / grid.cellSize);
-
-    // Apply obstacle weight to nearby cells with exponential decay
-    for (let dy = -influenceRadius; dy <= influenceRadius; dy++) {
-      for (let dx = -influenceRadius; dx <= influenceRadius; dx++) {
-        const x = obsCoords.x + dx;
-        const y = obsCoords.y + dy;
-
-        // Skip if outside grid bounds
-        if (x < 0 || x > grid.maxX || y < 0 || y > grid.maxY) continue;
-
-        const cell = grid.cells[y][x];
-
-        // Calculate distance from obstacle (in grid cells)
-        const distance = Math.sqrt(dx * dx + dy * dy);
-
-        // Skip if outside influence radius
-        if (distance > influenceRadius) continue;
-
-        // Calculate weight based on distance (higher weight = more difficult)
-        // Use exponential decay: weight decreases as distance increases
-        const distanceRatio = 1 - (distance / influenceRadius);
-        const weightContribution = obstacleScore * Math.pow(distanceRatio, 2);
+    // Obstacles just outside the grid still reach cells within the radius
+    const paddedX = obsCoords.x + influenceRadius;
+    const paddedY = obsCoords.y + influenceRadius;
+    if (
+      paddedX < 0 || paddedX >= paddedCols || paddedY < 0 ||
+      paddedY >= paddedRows
+    ) {
+      continue;
+    }
 
-        // Apply the obstacle weight
-        cell.obstacleWeight += weightContribution;
+    const cellKey = paddedY * paddedCols + paddedX;
+    cellScores.set(cellKey, (cellScores.get(cellKey) ?? 0) + obstacleScore);
+  }
 
-        // Mark as having an obstacle if very close
-        if (distance <= 1) {
-          cell.hasObstacle = true;
-        }
+  for (const [cellKey, obstacleScore] of cellScores) {
+    const obsX = cellKey % paddedCols - influenceRadius;
+    const obsY = Math.floor(cellKey / paddedCols) - influenceRadius;
+
+    // Clip the kernel to the grid once instead of bounds-checking every cell
+    const minDx = Math.max(-influenceRadius, -obsX);
+    const maxDx = Math.min(influenceRadius, grid.maxX - obsX);
+    const minDy = Math.max(-influenceRadius, -obsY);
+    const maxDy = Math.min(influenceRadius, grid.maxY - obsY);
+
+    // Apply obstacle weight to nearby cells (higher weight = more difficult)
+    for (let dy = minDy; dy <= maxDy; dy++) {
+      const rowBase = (obsY + dy) * grid.cols + obsX;
+      const kernelBase = (dy + influenceRadius) * kernelSize + influenceRadius;
+      for (let dx = minDx; dx <= maxDx; dx++) {
+        overlay[rowBase + dx] += obstacleScore * kernel[kernelBase + dx];
       }
     }
   }
 
   console.log("Finished applying obstacles to grid");
+  return overlay;
 }
 
 /**
  * Find the nearest road cell to a given point
  */
-function findNearestRoadCell(grid: Grid, point: Point): GridCell | null {
+export function findNearestRoadCell(grid: Grid, point: Point): GridCell | null {
   // Get the grid coordinates for the point
   const coords = getGridCoordinates(point.latitude, point.longitude, grid);
 
@@ -997,124 +1862,180 @@ function findNearestRoadCell(grid: Grid, point: Point): GridCell | null {
 }
 
 /**
- * A* pathfinding algorithm
+ * Binary min-heap of cell indices keyed by f score, backed by typed arrays.
+ * Stale entries are left in place and skipped by the caller once the cell
+ * has been closed (lazy deletion), which avoids a decrease-key operation.
+ * Keys are stored as float32, which is plenty for grid path costs
  */
-function findPathAStar(
+class CellHeap {
+  private keys: Float32Array;
+  private cells: Int32Array;
+  size = 0;
+
+  constructor(capacity: number) {
+    this.keys = new Float32Array(Math.max(capacity, 16));
+    this.cells = new Int32Array(Math.max(capacity, 16));
+  }
+
+  push(cell: number, f: number): void {
+    // Round first so comparisons match the stored keys
+    const key = Math.fround(f);
+
+    if (this.size === this.keys.length) {
+      const keys = new Float32Array(this.keys.length * 2);
+      const cells = new Int32Array(this.cells.length * 2);
+      keys.set(this.keys);
+      cells.set(this.cells);
+      this.keys = keys;
+      this.cells = cells;
+    }
+
+    // Sift up
+    let i = this.size++;
+    while (i > 0) {
+      const parent = (i - 1) >> 1;
+      if (this.keys[parent] <= key) break;
+      this.keys[i] = this.keys[parent];
+      this.cells[i] = this.cells[parent];
+      i = parent;
+    }
+    this.keys[i] = key;
+    this.cells[i] = cell;
+  }
+
+  pop(): number {
+    const top = this.cells[0];
+    const key = this.keys[--this.size];
+    const cell = this.cells[this.size];
+
+    // Sift down
+    let i = 0;
+    const half = this.size >> 1;
+    while (i < half) {
+      let child = 2 * i + 1;
+      if (
+        child + 1 < this.size && this.keys[child + 1] < this.keys[child]
+      ) {
+        child++;
+      }
+      if (this.keys[child] >= key) break;
+      this.keys[i] = this.keys[child];
+      this.cells[i] = this.cells[child];
+      i = child;
+    }
+    this.keys[i] = key;
+    this.cells[i] = cell;
+
+    return top;
+  }
+}
+
+/**
+ * A* pathfinding algorithm.
+ *
+ * The search is deliberately unidirectional: the Euclidean heuristic is not
+ * scaled down by the cheapest road factor, so it already pulls the search
+ * tightly towards the goal, and a bidirectional variant settled more cells
+ * on street-like grids. The turn penalty also depends on the predecessor,
+ * which a backward search can only approximate.
+ */
+export function findPathAStar(
   grid: Grid,
   start: GridCell,
   goal: GridCell,
+  obstacleOverlay: Float32Array | null = null,
+  roadTypeCostFactors: Float32Array = ROAD_TYPE_COST_FACTORS,
 ): GridCell[] {
   console.log(
     `Finding path from (${start.x},${start.y}) to (${goal.x},${goal.y})`,
   );
 
-  // Create open and closed sets
-  const openSet: GridCell[] = [start];
-  const closedSet = new Set<string>();
+  const { cols, roadTypeCodes, adjacencyOffsets, adjacencyTargets } = grid;
+  const totalCells = grid.rows * cols;
+  const startIndex = start.y * cols + start.x;
+  const goalIndex = goal.y * cols + goal.x;
+
+  // Per-search state, indexed by flat cell index. Costs are float32: a path
+  // is at most maxIterations steps of a few units each, far below the 2^24
+  // range where float32 stops resolving unit steps
+  const gScore = new Float32Array(totalCells).fill(Infinity);
+  const parent = new Int32Array(totalCells).fill(-1);
+  const closed = new Uint8Array(totalCells);
+  const openSet = new CellHeap(1024);
 
   // Initialize start node
-  start.g = 0;
-  start.h = heuristic(start, goal);
-  start.f = start.g + start.h;
-  start.parent = null;
+  gScore[startIndex] = 0;
+  openSet.push(startIndex, heuristic(start.x, start.y, goal.x, goal.y));
 
   let iterations = 0;
-  const maxIterations = Math.min(
-    grid.cells.length * grid.cells[0].length,
-    100000,
-  ); // Prevent infinite loops
+  const maxIterations = Math.min(totalCells, 100000); // Prevent infinite loops
 
-  while (openSet.length > 0 && iterations < maxIterations) {
+  while (openSet.size > 0 && iterations < maxIterations) {
+    // Take the node with the lowest f value
+    const current = openSet.pop();
+    if (closed[current]) continue; // Stale heap entry
     iterations++;
-    // Find the node with the lowest f value
-    let current = openSet[0];
-    let currentIndex = 0;
-
-    for (let i = 1; i < openSet.length; i++) {
-      if ((openSet[i].f || Infinity) < (current.f || Infinity)) {
-        current = openSet[i];
-        currentIndex = i;
-      }
-    }
 
     // If we reached the goal, reconstruct and return the path
-    if (current === goal) {
+    if (current === goalIndex) {
       console.log("Path found!");
-      return reconstructPath(goal);
+      return reconstructPath(grid, parent, goalIndex);
     }
 
-    // Move current from open to closed set
-    openSet.splice(currentIndex, 1);
-    closedSet.add(`${current.x},${current.y}`);
+    // Move current to the closed set
+    closed[current] = 1;
+
+    const currentX = current % cols;
+    const currentY = (current - currentX) / cols;
+    const currentParent = parent[current];
+    const currentG = gScore[current];
+
+    // Direction code of the step that led into current
+    let parentDirection = -1;
+    if (currentParent !== -1) {
+      const parentX = currentParent % cols;
+      const parentY = (currentParent - parentX) / cols;
+      parentDirection = (currentX - parentX + 1) * 3 + (currentY - parentY + 1);
+    }
 
     // Check all connections (neighbors)
-    for (const neighbor of current.connections) {
+    for (
+      let e = adjacencyOffsets[current];
+      e < adjacencyOffsets[current + 1];
+      e++
+    ) {
+      const neighbor = adjacencyTargets[e];
+
       // Skip if neighbor is in closed set
-      if (closedSet.has(`${neighbor.x},${neighbor.y}`)) continue;
-
-      // Calculate tentative g score with enhanced road-aware weighting
-      let weight = 1 + (neighbor.obstacleWeight || 0);
-
-      // Add road quality bonus/penalty
-      if (neighbor.roadType) {
-        switch (neighbor.roadType) {
-          case "footway":
-          case "pedestrian":
-            weight *= 0.8; // Prefer dedicated pedestrian paths
-            break;
-          case "path":
-            weight *= 0.9; // Prefer paths
-            break;
-          case "residential":
-            weight *= 1.1; // Slightly less preferred
-            break;
-          case "service":
-            weight *= 1.2; // Less preferred
-            break;
-          default:
-            weight *= 1.0;
-        }
-      }
+      if (closed[neighbor]) continue;
 
-      // Add smoothness bonus for straight-line connections
-      if (current.parent) {
-        const currentAngle = Math.atan2(
-          neighbor.y - current.y,
-          neighbor.x - current.x,
-        );
-        const parentAngle = Math.atan2(
-          current.y - current.parent.y,
-          current.x - current.parent.x,
-        );
-        const angleDiff = Math.abs(currentAngle - parentAngle);
-        const normalizedAngleDiff = Math.min(
-          angleDiff,
-          2 * Math.PI - angleDiff,
-        );
+      const neighborX = neighbor % cols;
+      const neighborY = (neighbor - neighborX) / cols;
 
-        // Reward straight paths and penalize sharp turns
-        weight *= 1 + normalizedAngleDiff * 0.1;
+      // Road-aware weighting: obstacles overlay and road quality factor
+      let weight = roadTypeCostFactors[roadTypeCodes[neighbor]];
+      if (obstacleOverlay) {
+        weight *= 1 + obstacleOverlay[neighbor];
       }
 
-      const tentativeG = (current.g || 0) + weight;
+      // Add smoothness bonus for straight-line connections
+      if (parentDirection !== -1) {
+        weight *= TURN_PENALTY_FACTORS[
+          parentDirection * 9 +
+          (neighborX - currentX + 1) * 3 + (neighborY - currentY + 1)
+        ];
+      }
 
-      // Check if neighbor is already in open set
-      const neighborInOpenSet = openSet.find(
-        (cell) => cell.x === neighbor.x && cell.y === neighbor.y,
-      );
+      const tentativeG = currentG + weight;
 
-      if (!neighborInOpenSet) {
-        // New node, add to open set
-        neighbor.parent = current;
-        neighbor.g = tentativeG;
-        neighbor.h = heuristic(neighbor, goal);
-        neighbor.f = neighbor.g + neighbor.h;
-        openSet.push(neighbor);
-      } else if (tentativeG < (neighborInOpenSet.g || Infinity)) {
-        // This path is better than previous one
-        neighborInOpenSet.parent = current;
-        neighborInOpenSet.g = tentativeG;
-        neighborInOpenSet.f = tentativeG + (neighborInOpenSet.h || 0);
+      // Only keep the path if it is better than any previous one
+      if (tentativeG < gScore[neighbor]) {
+        parent[neighbor] = current;
+        gScore[neighbor] = tentativeG;
+        openSet.push(
+          neighbor,
+          tentativeG + heuristic(neighborX, neighborY, goal.x, goal.y),
+        );
       }
     }
   }
@@ -1131,28 +2052,52 @@ function findPathAStar(
 }
 
 /**
- * Heuristic function for A* (Euclidean distance)
+ * Precompute the turn penalty for every pair of 8-way step directions:
+ * straight paths are rewarded and sharp turns penalized
+ */
+function getTurnPenaltyFactors(): Float32Array {
+  const factors = new Float32Array(81);
+
+  for (let prev = 0; prev < 9; prev++) {
+    const parentAngle = Math.atan2(prev % 3 - 1, Math.floor(prev / 3) - 1);
+    for (let next = 0; next < 9; next++) {
+      const currentAngle = Math.atan2(next % 3 - 1, Math.floor(next / 3) - 1);
+      const angleDiff = Math.abs(currentAngle - parentAngle);
+      const normalizedAngleDiff = Math.min(angleDiff, 2 * Math.PI - angleDiff);
+      factors[prev * 9 + next] = 1 + normalizedAngleDiff * 0.1;
+    }
+  }
+
+  return factors;
+}
+
+/**
+ * Heuristic function for A* (Euclidean distance in cells; cells are square
+ * in meters, so this is proportional to the ground distance)
  */
-function heuristic(a: GridCell, b: GridCell): number {
+function heuristic(ax: number, ay: number, bx: number, by: number): number {
   // Use Euclidean distance as heuristic
-  const dx = a.x - b.x;
-  const dy = a.y - b.y;
+  const dx = ax - bx;
+  const dy = ay - by;
   return Math.sqrt(dx * dx + dy * dy);
 }
 
 /**
  * Reconstruct the path from goal to start
  */
-function reconstructPath(goal: GridCell): GridCell[] {
+function reconstructPath(
+  grid: Grid,
+  parent: Int32Array,
+  goalIndex: number,
+): GridCell[] {
   const path: GridCell[] = [];
-  let current: GridCell | null | undefined = goal;
 
-  while (current) {
-    path.unshift(current);
-    current = current.parent;
+  for (let index = goalIndex; index !== -1; index = parent[index]) {
+    const x = index % grid.cols;
+    path.push(grid.cells[(index - x) / grid.cols][x]);
   }
 
-  return path;
+  return path.reverse();
 }
 
 /**
@@ -1244,10 +2189,121 @@ function lightweightRoadSnap(
   return result;
 }
 
+/**
+ * Get the road segment index for OSM data, building it on first use
+ */
+export function getRoadSegmentIndex(osmData: OsmData): RoadSegmentIndex {
+  const cached = roadSegmentIndexes.get(osmData);
+  if (cached) return cached;
+
+  const wayIndices: number[] = [];
+  const segmentIndices: number[] = [];
+  const lat1: number[] = [];
+  const lon1: number[] = [];
+  const lat2: number[] = [];
+  const lon2: number[] = [];
+  const buckets = new Map<number, number[]>();
+
+  osmData.ways.forEach((way, wayIndex) => {
+    for (let i = 0; i < way.nodes.length - 1; i++) {
+      const node1 = osmData.nodes[way.nodes[i]];
+      const node2 = osmData.nodes[way.nodes[i + 1]];
+
+      if (!node1 || !node2) continue;
+
+      const id = wayIndices.length;
+      wayIndices.push(wayIndex);
+      segmentIndices.push(i);
+      lat1.push(node1.lat);
+      lon1.push(node1.lon);
+      lat2.push(node2.lat);
+      lon2.push(node2.lon);
+
+      // Register the segment in every bucket its bounding box touches
+      const minY = getSegmentBucket(Math.min(node1.lat, node2.lat));
+      const maxY = getSegmentBucket(Math.max(node1.lat, node2.lat));
+      const minX = getSegmentBucket(Math.min(node1.lon, node2.lon));
+      const maxX = getSegmentBucket(Math.max(node1.lon, node2.lon));
+      for (let by = minY; by <= maxY; by++) {
+        for (let bx = minX; bx <= maxX; bx++) {
+          const key = getSegmentBucketKey(by, bx);
+          const bucket = buckets.get(key);
+          if (bucket) {
+            bucket.push(id);
+          } else {
+            buckets.set(key, [id]);
+          }
+        }
+      }
+    }
+  });
+
+  const index: RoadSegmentIndex = {
+    buckets,
+    wayIndices: Int32Array.from(wayIndices),
+    segmentIndices: Int32Array.from(segmentIndices),
+    lat1: Float64Array.from(lat1),
+    lon1: Float64Array.from(lon1),
+    lat2: Float64Array.from(lat2),
+    lon2: Float64Array.from(lon2),
+  };
+  roadSegmentIndexes.set(osmData, index);
+  return index;
+}
+
+/**
+ * Bucket coordinate of a latitude or longitude in the segment index
+ */
+function getSegmentBucket(degrees: number): number {
+  return Math.floor(degrees / SEGMENT_INDEX_BUCKET_SIZE);
+}
+
+/**
+ * Combine bucket coordinates into a single map key
+ */
+function getSegmentBucketKey(latBucket: number, lonBucket: number): number {
+  return latBucket * 1e6 + lonBucket;
+}
+
+/**
+ * Get the ids of segments that may lie within maxDistance meters of a point,
+ * in ascending (scan) order
+ */
+export function queryRoadSegments(
+  index: RoadSegmentIndex,
+  point: Point,
+  maxDistance: number,
+): number[] {
+  // Conservative degree extents of the search radius (1 degree >= 111km)
+  const latRadius = maxDistance / 111000;
+  const lonRadius = maxDistance /
+    (111000 * Math.max(Math.cos(point.latitude * Math.PI / 180), 0.01));
+
+  const minY = getSegmentBucket(point.latitude - latRadius);
+  const maxY = getSegmentBucket(point.latitude + latRadius);
+  const minX = getSegmentBucket(point.longitude - lonRadius);
+  const maxX = getSegmentBucket(point.longitude + lonRadius);
+
+  const candidates: number[] = [];
+  for (let by = minY; by <= maxY; by++) {
+    for (let bx = minX; bx <= maxX; bx++) {
+      const bucket = index.buckets.get(getSegmentBucketKey(by, bx));
+      if (!bucket) continue;
+      for (const id of bucket) {
+        candidates.push(id);
+      }
+    }
+  }
+
+  // Long segments can appear in several buckets
+  candidates.sort((a, b) => a - b);
+  return candidates.filter((id, i) => i === 0 || candidates[i - 1] !== id);
+}
+
 /**
  * Find the nearest point on any road within the specified distance
  */
-function findNearestRoadPoint(
+export function findNearestRoadPoint(
   point: Point,
   osmData: OsmData,
   maxDistance: number,
@@ -1255,40 +2311,27 @@ function findNearestRoadPoint(
   let nearestPoint: Point | null = null;
   let minDistance = maxDistance;
 
-  // Check all ways for maximum precision in ultra-precision mode
-  const waysToCheck = osmData.ways.slice(
-    0,
-    Math.min(2000, osmData.ways.length),
-  );
+  // Check the segments near the point
+  const index = getRoadSegmentIndex(osmData);
 
-  for (const way of waysToCheck) {
-    if (way.nodes.length < 2) continue;
-
-    // Check each segment of the way
-    for (let i = 0; i < way.nodes.length - 1; i++) {
-      const node1 = osmData.nodes[way.nodes[i]];
-      const node2 = osmData.nodes[way.nodes[i + 1]];
-
-      if (!node1 || !node2) continue;
-
-      // Calculate projection onto this segment
-      const projected = projectPointOntoSegment(
-        point,
-        { latitude: node1.lat, longitude: node1.lon },
-        { latitude: node2.lat, longitude: node2.lon },
-      );
+  for (const id of queryRoadSegments(index, point, maxDistance)) {
+    // Calculate projection onto this segment
+    const projected = projectPointOntoSegment(
+      point,
+      { latitude: index.lat1[id], longitude: index.lon1[id] },
+      { latitude: index.lat2[id], longitude: index.lon2[id] },
+    );
 
-      const distance = haversineDistanceInMeters(
-        point.latitude,
-        point.longitude,
-        projected.latitude,
-        projected.longitude,
-      );
+    const distance = haversineDistanceInMeters(
+      point.latitude,
+      point.longitude,
+      projected.latitude,
+      projected.longitude,
+    );
 
-      if (distance < minDistance) {
-        minDistance = distance;
-        nearestPoint = projected;
-      }
+    if (distance < minDistance) {
+      minDistance = distance;
+      nearestPoint = projected;
     }
   }
 
@@ -1362,57 +2405,42 @@ function findNearbyRoadSegments(
   const segments: Array<
     { way: OsmWay; segmentIndex: number; projectedPoint: Point }
   > = [];
+  const distances: number[] = [];
 
-  for (const way of osmData.ways.slice(0, Math.min(500, osmData.ways.length))) {
-    if (way.nodes.length < 2) continue;
-
-    for (let i = 0; i < way.nodes.length - 1; i++) {
-      const node1 = osmData.nodes[way.nodes[i]];
-      const node2 = osmData.nodes[way.nodes[i + 1]];
-
-      if (!node1 || !node2) continue;
+  // Check the segments near the point
+  const index = getRoadSegmentIndex(osmData);
 
-      const projected = projectPointOntoSegment(
-        point,
-        { latitude: node1.lat, longitude: node1.lon },
-        { latitude: node2.lat, longitude: node2.lon },
-      );
+  for (const id of queryRoadSegments(index, point, maxDistance)) {
+    const projected = projectPointOntoSegment(
+      point,
+      { latitude: index.lat1[id], longitude: index.lon1[id] },
+      { latitude: index.lat2[id], longitude: index.lon2[id] },
+    );
 
-      const distance = haversineDistanceInMeters(
-        point.latitude,
-        point.longitude,
-        projected.latitude,
-        projected.longitude,
-      );
+    const distance = haversineDistanceInMeters(
+      point.latitude,
+      point.longitude,
+      projected.latitude,
+      projected.longitude,
+    );
 
-      if (distance <= maxDistance) {
-        segments.push({
-          way,
-          segmentIndex: i,
-          projectedPoint: projected,
-        });
-      }
+    if (distance <= maxDistance) {
+      segments.push({
+        way: osmData.ways[index.wayIndices[id]],
+        segmentIndex: index.segmentIndices[id],
+        projectedPoint: projected,
+      });
+      distances.push(distance);
     }
   }
 
-  // Sort by distance
-  segments.sort((a, b) => {
-    const distA = haversineDistanceInMeters(
-      point.latitude,
-      point.longitude,
-      a.projectedPoint.latitude,
-      a.projectedPoint.longitude,
-    );
-    const distB = haversineDistanceInMeters(
-      point.latitude,
-      point.longitude,
-      b.projectedPoint.latitude,
-      b.projectedPoint.longitude,
-    );
-    return distA - distB;
-  });
+  // Sort by the distances computed above instead of recomputing them per
+  // comparison
+  const order = segments.map((_, i) => i);
+  order.sort((a, b) => distances[a] - distances[b]);
 
-  return segments.slice(0, 12); // Return top 12 closest segments for maximum path precision
+  // Return top 12 closest segments for maximum path precision
+  return order.slice(0, 12).map((i) => segments[i]);
 }
 
 /**
@@ -1475,7 +2503,7 @@ function traceAlongWay(
 /**
  * Project a point onto a line segment
  */
-function projectPointOntoSegment(
+export function projectPointOntoSegment(
   point: Point,
   segStart: Point,
   segEnd: Point,
@@ -1963,26 +2991,72 @@ export async function findAccessibleRoute(
       }
     }
 
-    // Fetch OSM data for the bounding box
-    const osmData = await fetchOsmData(bbox);
+    // Load filtered OSM data covering the bounding box from the cache, or
+    // fetch it for the snapped bounding box
+    const osmBbox = snapBoundingBox(bbox);
+    const cacheKey = getGraphCacheKey(osmBbox);
+    let filteredOsmData = getResidentOsmData(bbox);
 
-    // Validate OSM data - make sure we have at least some ways/nodes
-    if (
-      !osmData.ways || osmData.ways.length === 0 ||
-      Object.keys(osmData.nodes).length === 0
-    ) {
-      console.error("Insufficient OSM data retrieved for routing");
-      throw new Error("Could not retrieve sufficient map data for routing");
+    if (filteredOsmData) {
+      console.log(`Using in-memory OSM data covering ${cacheKey}`);
+    } else {
+      const cached = await loadCachedOsmData(bbox);
+      if (cached) {
+        console.log(`Using cached OSM data from ${cached.cacheKey}`);
+        setResidentOsmData(
+          cached.cacheKey,
+          cached.bbox,
+          cached.osmData,
+          cached.lastUpdated,
+        );
+        filteredOsmData = cached.osmData;
+      }
+    }
+
+    if (!filteredOsmData) {
+      const osmData = await fetchOsmData(osmBbox);
+
+      // Validate OSM data - make sure we have at least some ways/nodes
+      if (
+        osmData.ways && osmData.ways.length > 0 &&
+        Object.keys(osmData.nodes).length > 0
+      ) {
+        // Filter and optimize OSM data to reduce memory usage
+        const pedestrianOsmData = filterOsmDataForPedestrians(osmData);
+        filteredOsmData = pedestrianOsmData;
+        setResidentOsmData(cacheKey, osmBbox, pedestrianOsmData, Date.now());
+
+        // Write the cache entry once this route has been computed, as
+        // encoding starts with synchronous work on the whole dataset
+        setTimeout(() => {
+          storeCachedOsmData(cacheKey, osmBbox, pedestrianOsmData);
+        }, 0);
+      } else {
+        // Expired map data still routes better than none when Overpass is down
+        const stale = await loadCachedOsmData(bbox, true);
+        if (!stale) {
+          console.error("Insufficient OSM data retrieved for routing");
+          throw new Error(
+            "Could not retrieve sufficient map data for routing",
+          );
+        }
+        console.warn(`Using expired cached OSM data from ${stale.cacheKey}`);
+        filteredOsmData = stale.osmData;
+      }
     }
 
-    // Filter and optimize OSM data to reduce memory usage
-    const filteredOsmData = filterOsmDataForPedestrians(osmData);
     console.log(
       `Filtered OSM data: ${
         Object.keys(filteredOsmData.nodes).length
       } nodes, ${filteredOsmData.ways.length} ways`,
     );
 
+    // Cost factors for this request's preferences, shared by every grid
+    const roadTypeCostFactors = getRoadTypeCostFactors(userPreferences);
+
+    // Cached data may cover a much larger area than this route
+    const gridOsmData = clipOsmDataToBbox(filteredOsmData, bbox);
+
     // Try cell sizes - ultra-high precision for maximum accuracy
     const cellSizes = [2, 4, 8]; // meters
     let lastError = null;
@@ -1990,17 +3064,38 @@ export async function findAccessibleRoute(
       try {
         console.log(`Trying grid cell size: ${cellSize}m`);
         const grid = createGrid(bbox, cellSize);
-        mapRoadsToGrid(filteredOsmData, grid);
+        mapRoadsToGrid(gridOsmData, grid, roadTypeCostFactors);
         connectRoadCells(grid);
-        if (avoidObstacles && obstacles.length > 0) {
-          applyObstaclesToGrid(grid, obstacles);
+        let obstacleOverlay = avoidObstacles && obstacles.length > 0
+          ? buildObstacleOverlay(grid, obstacles)
+          : null;
+        if (userPreferences?.minimumWidth) {
+          obstacleOverlay = addNarrowWayPenalties(
+            grid,
+            obstacleOverlay,
+            userPreferences.minimumWidth,
+          );
         }
         const startCell = findNearestRoadCell(grid, origin);
         const goalCell = findNearestRoadCell(grid, destination);
         if (!startCell || !goalCell) {
           throw new Error("No accessible roads near the origin or destination");
         }
-        const gridPath = findPathAStar(grid, startCell, goalCell);
+        if (
+          grid.componentLabels[startCell.y * grid.cols + startCell.x] !==
+            grid.componentLabels[goalCell.y * grid.cols + goalCell.x]
+        ) {
+          throw new Error(
+            "Origin and destination are not connected by accessible roads",
+          );
+        }
+        const gridPath = findPathAStar(
+          grid,
+          startCell,
+          goalCell,
+          obstacleOverlay,
+          roadTypeCostFactors,
+        );
         if (gridPath.length === 0) {
           throw new Error("Could not find an accessible route");
         }